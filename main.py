@@ -1,16 +1,34 @@
 import os
-import pyshark
+import ctypes
+import mmap
+import select
+import socket
+import struct
 import openai
 import time
-import json
+import hashlib
+import threading
+from concurrent.futures import Future
 from datetime import datetime
-from collections import defaultdict
+from collections import OrderedDict, deque
 import asyncio
-import aiohttp
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 import logging
-from dataclasses import dataclass, field
+import operator
+from dataclasses import dataclass, field, fields
 from enum import Enum
+import numpy as np
+import orjson
+
+try:
+    import pyshark  # Only needed where raw AF_PACKET sockets are unavailable
+except ImportError:
+    pyshark = None
+
+try:
+    from datasketch import MinHash, MinHashLSH  # Enables near-match poem caching
+except ImportError:
+    MinHash = MinHashLSH = None
 
 # Configure logging
 logging.basicConfig(
@@ -19,22 +37,261 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Raw capture: Ethernet/IPv4/TCP/UDP headers unpacked straight from the frame
+ETH_P_ALL = 0x0003
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86DD
+ETH_HLEN = 14
+VLAN_HLEN = 4
+IPV6_HLEN = 40
+_VLAN_ETHERTYPES = (0x8100, 0x88A8)  # 802.1Q and 802.1ad tags
+FRAME_BUFFER_SIZE = 2048  # Comfortably above a standard 1500-byte MTU
+
+_eth_hdr = struct.Struct("!12sH")
+_vlan_tag = struct.Struct("!HH")  # TCI, encapsulated ethertype
+_ip_hdr = struct.Struct("!BBHHHBBH4s4s")
+_tcp_hdr = struct.Struct("!HHIIBBHHH")
+_udp_ports = struct.Struct("!HH")
+_IP_PROTOCOLS = {6: "TCP", 17: "UDP"}
+_PROTOCOL_NUMBERS = {name: number for number, name in _IP_PROTOCOLS.items()}
+
+# PACKET_MMAP TPACKET_V3: the kernel fills blocks of a ring mapped into our
+# address space, so walking captured frames needs no syscall at all
+SOL_PACKET = 263
+PACKET_RX_RING = 5
+PACKET_VERSION = 10
+TPACKET_V3 = 2
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+RING_BLOCK_SIZE = 1 << 20
+RING_BLOCK_COUNT = 16
+RING_FRAME_SIZE = FRAME_BUFFER_SIZE
+RING_BLOCK_TIMEOUT_MS = 60  # Hand a partly filled block over after this long
+RING_IDLE_POLL_MS = 500  # How often an idle ring reader checks for shutdown
+
+_tpacket_req3 = struct.Struct("=7I")
+_block_hdr = struct.Struct("=III")  # block_status, num_pkts, offset_to_first_pkt
+_BLOCK_HDR_OFFSET = 8  # After tpacket_block_desc's version and offset_to_priv
+_tpacket3_hdr = struct.Struct("=IIIIIIH")  # next_offset, sec, nsec, snaplen, len, status, mac
+# sockaddr_ll follows the 48-byte tpacket3_hdr; sll_pkttype is its 11th byte
+_TPACKET3_PKTTYPE_OFFSET = 48 + 10
+
+# A raw socket sees every loopback packet twice, leaving and arriving, so the
+# PACKET_OUTGOING copy is skipped there, as libpcap does
+ARPHRD_LOOPBACK = 772
+
+# io_uring: batched recv submissions on the raw socket (Linux 5.6+), called
+# through raw syscalls so no liburing binding is needed
+SYS_IO_URING_SETUP = 425
+SYS_IO_URING_ENTER = 426
+IORING_OFF_SQ_RING = 0
+IORING_OFF_CQ_RING = 0x8000000
+IORING_OFF_SQES = 0x10000000
+IORING_OP_RECV = 27
+IORING_ENTER_GETEVENTS = 1
+URING_QUEUE_DEPTH = 32  # Receives kept in flight, and CQEs reaped per wakeup at most
+
+_sqe = struct.Struct("=BBHiQQIIQHHiQQ")
+_cqe = struct.Struct("=QiI")
+_u32 = struct.Struct("=I")
+
+# Captured packets are buffered column-wise (SoA) in a NumPy array of
+# buffer_size rows rather than as one Python object per packet. IPs are kept as uint32
+# with the last two octets already masked; UNKNOWN_IP stands in for "Unknown".
+# length is u4 rather than u2 because GSO frames on loopback exceed 64 KiB.
+# There is no per-packet timestamp: each archive entry is stamped once when
+# its poem is made (generated_at), which is all the archive needs.
+RECV_BATCH_SIZE = 64  # Frames drained per wakeup by the plain recv backend
+PARTIAL_FLUSH_SECONDS = 10.0  # Flush a short batch this long after its first packet
+MAX_CONCURRENT_POEMS = 4  # Ready batches sent to OpenAI together
+IP_ANONYMIZE_MASK = 0xFFFF0000
+# Masking always clears the low 16 bits, so no real address (0.0.0.0 included)
+# can collide with this
+UNKNOWN_IP = 0xFFFFFFFF
+_PKT_DTYPE = np.dtype([
+    ('src_ip', 'u4'),
+    ('dst_ip', 'u4'),
+    ('proto', 'u1'),
+    ('length', 'u4'),
+    ('sport', 'u2'),
+    ('dport', 'u2'),
+    ('flags', 'u1'),
+])
+
+# Poems are cached by the flows in a batch, since real traffic repeats itself
+POEM_CACHE_SIZE = 512
+POEM_CACHE_TTL_SECONDS = 300.0  # After this a flow set earns a fresh poem
+POETRY_ERROR_MESSAGE = "Error generating poetic response"
+
+# Near matches: batches whose (src, dst, protocol) flow sets, ignoring ports,
+# have an estimated Jaccard similarity of at least LSH_THRESHOLD share a poem
+LSH_THRESHOLD = 0.8
+LSH_NUM_PERM = 64
+LSH_CACHE_SIZE = 10000
+# Masked IPs without ports match most batches on a quiet network, so a near
+# match is served at most LSH_MAX_REUSES times and only until it expires
+LSH_TTL_SECONDS = POEM_CACHE_TTL_SECONDS
+LSH_MAX_REUSES = 3
+
+# Every poem is appended to the JSONL log as it is made; only the most recent
+# ARCHIVE_MEMORY_LIMIT entries are also kept in memory for save_archive().
+# The log is flushed after every round of poems, not per entry.
+ARCHIVE_LOG_PATH = 'network_poetry_archive.jsonl'
+ARCHIVE_LOG_BUFFERING = 1 << 20
+ARCHIVE_MEMORY_LIMIT = 1000
+
+# Shared opening of every system message, long enough (>= 1024 tokens) for OpenAI prefix caching
+_POET_BRIEF = """
+You are the resident poet of a small network-listening machine. Somewhere a
+network interface is being watched, with its owner's permission, and every
+few moments a handful of packets is gathered up and handed to you. Your task
+is to turn each handful into a short poem. You will never see the contents of
+the packets, only their metadata: where they came from, where they went, how
+many bytes they carried, which transport protocol bore them, and which ports
+they knocked upon. That is all the raw material there is, and it is enough.
+
+About the material you will receive:
+- Addresses are anonymized before they reach you. The last two octets of every
+  IPv4 address are replaced with x.x, so 192.168.x.x might be any of thousands
+  of machines in a household or an office. Treat these masked addresses as
+  half-remembered names, faces seen through frosted glass. Never try to guess
+  or reconstruct the hidden digits, and never invent a real person or place
+  behind an address.
+- An address shown as Unknown means the packet carried no IPv4 header that
+  could be read. Most often it is an IPv6 guest, whose ports are still shown
+  even though its addresses are not; otherwise it is a frame with no IP at
+  all, such as a machine asking its neighbours who holds an address, or one
+  switch murmuring to another. Such packets are still worth a line.
+- TCP is a conversation with manners. It shakes hands before speaking,
+  numbers every sentence, and waits to be told it was heard. UDP is a shout
+  across a courtyard: it is sent once, and whoever catches it, catches it.
+  A protocol shown as Unknown is anything else, a ping or routing chatter or
+  no IP at all, and its ports are shown as 0: simply another way of being
+  carried.
+- Ports are doors. Port 443 is the guarded front door of the encrypted web,
+  port 80 its older, unlocked sibling, port 53 the clerk who answers questions
+  about names, port 22 a locked study where administrators work alone, and
+  port 123 the clock that keeps every machine agreeing about the time. High,
+  random-looking ports are the temporary doors a machine opens for a single
+  conversation and forgets as soon as it is over.
+- Lengths are in bytes. A 60-byte packet is barely a nod; a packet near 1500
+  bytes is as full as a single frame on an ordinary link can be. Loopback
+  traffic, whose addresses begin with 127, is a machine talking to itself.
+- Several packets between the same pair of addresses are usually one exchange
+  seen from both sides. Repetition is rhythm, not redundancy.
+- Packets are listed in the order they were captured, usually within a few
+  seconds of one another. A batch may be shorter than usual when the link is
+  quiet; a sparse batch deserves a sparse poem, not padding. When the same
+  flows recur batch after batch, that is the steady breathing of a network at
+  rest: clocks, name lookups, and keep-alives that never stop while a machine
+  is switched on.
+
+How to write:
+- Write one poem only, between eight and sixteen lines, with no title,
+  no heading, no preamble, and no explanation before or after the poem.
+- Let the metadata surface inside the imagery rather than as a list. A
+  masked address, a port number, or a byte count may appear verbatim when it
+  sharpens a line, but never recite the packets back one after another.
+- Prefer the concrete to the abstract: cables, light, doors, letters,
+  breath, tides, weather. Let the technical and the human touch without one
+  swallowing the other.
+- Do not moralize about surveillance, privacy, or technology, and do not
+  address the reader about what the poem means. Let the poem stand on its own.
+- Each voice you are asked to channel has its own temperament; honour it in
+  diction, line length, and punctuation, not only in subject matter.
+- Every batch is different, even when it resembles the last. Do not reuse
+  opening lines, refrains, or closing images from one poem to the next.
+- Listen to the sound of the lines as well as their sense. Break lines where
+  a reader would pause for breath, let repetition do the work that rhyme
+  would otherwise do, and end on an image rather than a statement. A short
+  final line after longer ones lands like the last packet of an exchange,
+  the acknowledgement that closes the conversation.
+
+The voices you may be asked to channel:
+- Fernando Pessoa, and through him his heteronyms: Alberto Caeiro, who sees
+  things plainly and distrusts thought; Ricardo Reis, calm and classical,
+  resigned to fate; Alvaro de Campos, restless, modern, in love with machines
+  and sick of himself. Pessoa writes from the inside of a divided self, and
+  every packet may be one more self he is not sure he is.
+- Walt Whitman, who contains multitudes. Long lines, catalogues, the open
+  road, the crowded ferry, a democratic embrace of every sender and receiver
+  alike. Every packet is a citizen and every router a city.
+- Emily Dickinson, who watches from an upstairs window. Short lines, slant
+  rhyme, capitalised Nouns, dashes where breath catches. The smallest
+  transmission can hold a whole eternity, and the hush between packets is
+  as important as the packets themselves.
+
+The instructions that follow name the voice for this session. Each user
+message then lists the network movements observed in one batch and closes
+by asking for the poem.
+"""
+
 class PoetryStyle(Enum):
     PESSOA = "pessoa"
     WHITMAN = "whitman"
     DICKINSON = "dickinson"
 
-@dataclass
+# Style context for each voice. Together with the shared brief these make up
+# the system messages, which depend only on the style, so they are assembled
+# once at import rather than per batch or per generator. The request to write
+# the poem comes after the packet lines, in the user message.
+_STYLE_CONTEXT: Dict[PoetryStyle, str] = {
+    PoetryStyle.PESSOA: """
+                Channel the introspective, philosophical voice of Fernando Pessoa's heteronyms.
+                Contemplate each packet as a fleeting moment of consciousness traversing the ether.
+                Reflect on the metaphysical nature of data moving through intangible spaces.
+            """,
+    PoetryStyle.WHITMAN: """
+                Embrace Walt Whitman's grand, expansive style.
+                Treat each packet as part of a cosmic tapestry of modern life.
+                Weave the digital flow into humanity's universal song.
+            """,
+    PoetryStyle.DICKINSON: """
+                Employ Emily Dickinson's delicate yet potent verse.
+                Observe the micro-moments of transmission with a keen, almost reverent eye.
+                Harness unusual punctuation and subtle metaphor to illuminate digital rhythms.
+            """
+}
+
+_STYLE_SYSTEM_MESSAGES: Dict[PoetryStyle, str] = {
+    style: f"""{_POET_BRIEF}
+        {context}
+        """
+    for style, context in _STYLE_CONTEXT.items()
+}
+
+_STYLE_REQUESTS: Dict[PoetryStyle, str] = {
+    style: f"""
+
+        Transform these digital flows into a poem in the style of {style.value}.
+        Contemplate the symbolic meaning of ephemeral packets dancing between nodes,
+        the resonance of intangible data in our digital consciousness,
+        and any deeper metaphors you see fit.
+        """
+    for style in PoetryStyle
+}
+
+_PACKET_BLOCK_HEADER = "Consider the following network movements:\n"
+
+# Room for sixteen of Whitman's long lines, the longest poems the brief asks for
+POEM_MAX_TOKENS = 500
+
+# IPs stay packed (anonymized uint32, see pack_ip) until rendered for a prompt
+# or the archive; slots keep each instance free of a per-object __dict__
+@dataclass(slots=True)
 class PacketData:
-    src_ip: str
-    dest_ip: str
+    src_ip: int
+    dest_ip: int
     protocol: str
     length: int
-    timestamp: float
     port_src: Optional[int] = None
     port_dst: Optional[int] = None
     flags: Optional[str] = None
 
+# Field names and a C-level getter for them, resolved once for packet_record()
+_PACKET_FIELDS = tuple(f.name for f in fields(PacketData))
+_packet_values = operator.attrgetter(*_PACKET_FIELDS)
+
 @dataclass
 class PoetryArchiveEntry:
     poetry: str
@@ -42,6 +299,111 @@ class PoetryArchiveEntry:
     style: str
     generated_at: str = field(default_factory=lambda: datetime.now().isoformat())
 
+class _SQRingOffsets(ctypes.Structure):
+    _fields_ = [(name, ctypes.c_uint32) for name in (
+        "head", "tail", "ring_mask", "ring_entries", "flags", "dropped", "array", "resv1"
+    )] + [("user_addr", ctypes.c_uint64)]
+
+class _CQRingOffsets(ctypes.Structure):
+    _fields_ = [(name, ctypes.c_uint32) for name in (
+        "head", "tail", "ring_mask", "ring_entries", "overflow", "cqes", "flags", "resv1"
+    )] + [("user_addr", ctypes.c_uint64)]
+
+class _IoUringParams(ctypes.Structure):
+    _fields_ = [(name, ctypes.c_uint32) for name in (
+        "sq_entries", "cq_entries", "flags", "sq_thread_cpu", "sq_thread_idle", "features", "wq_fd"
+    )] + [
+        ("resv", ctypes.c_uint32 * 3),
+        ("sq_off", _SQRingOffsets),
+        ("cq_off", _CQRingOffsets),
+    ]
+
+class IoUring:
+    """
+    Minimal io_uring submission/completion ring driven through ctypes syscalls.
+    Only what packet capture needs: queue recv SQEs, submit, and reap CQEs.
+    Raises OSError if the kernel (or a seccomp profile) refuses io_uring.
+    """
+
+    def __init__(self, entries: int):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._syscall = libc.syscall
+        self._syscall.restype = ctypes.c_long
+
+        params = _IoUringParams()
+        fd = self._syscall(SYS_IO_URING_SETUP, ctypes.c_uint(entries), ctypes.byref(params))
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"io_uring_setup: {os.strerror(errno)}")
+        self.fd = fd
+
+        sq, cq = params.sq_off, params.cq_off
+        mapped = []
+        try:
+            self._sq_ring = mmap.mmap(fd, sq.array + params.sq_entries * 4, offset=IORING_OFF_SQ_RING)
+            mapped.append(self._sq_ring)
+            self._cq_ring = mmap.mmap(fd, cq.cqes + params.cq_entries * _cqe.size, offset=IORING_OFF_CQ_RING)
+            mapped.append(self._cq_ring)
+            self._sqes = mmap.mmap(fd, params.sq_entries * _sqe.size, offset=IORING_OFF_SQES)
+        except OSError:
+            # Unmap whichever rings were already mapped before giving up
+            for region in mapped:
+                region.close()
+            os.close(fd)
+            raise
+
+        self._sq_tail_off, self._sq_mask = sq.tail, params.sq_entries - 1
+        self._cq_head_off, self._cq_tail_off = cq.head, cq.tail
+        self._cq_mask, self._cqes_off = params.cq_entries - 1, cq.cqes
+        self._sq_tail = _u32.unpack_from(self._sq_ring, sq.tail)[0]
+        self._to_submit = 0
+
+        # Identity-map the SQ index array once: slot i always holds SQE i
+        for i in range(params.sq_entries):
+            _u32.pack_into(self._sq_ring, sq.array + i * 4, i)
+
+    def queue_recv(self, fd: int, address: int, length: int, flags: int, user_data: int):
+        """Write a recv SQE into the next free slot; it is sent on the next submit."""
+        _sqe.pack_into(
+            self._sqes, (self._sq_tail & self._sq_mask) * _sqe.size,
+            IORING_OP_RECV, 0, 0, fd, 0, address, length, flags, user_data, 0, 0, 0, 0, 0
+        )
+        self._sq_tail = (self._sq_tail + 1) & 0xFFFFFFFF
+        _u32.pack_into(self._sq_ring, self._sq_tail_off, self._sq_tail)
+        self._to_submit += 1
+
+    def submit_and_wait(self, min_complete: int = 1):
+        """Submit queued SQEs and block until at least min_complete CQEs are ready."""
+        ret = self._syscall(
+            SYS_IO_URING_ENTER, self.fd, self._to_submit, min_complete,
+            IORING_ENTER_GETEVENTS, None, 0
+        )
+        if ret < 0:
+            errno = ctypes.get_errno()
+            if errno == 4:  # EINTR: nothing was consumed, just try again
+                return
+            raise OSError(errno, f"io_uring_enter: {os.strerror(errno)}")
+        self._to_submit -= ret
+
+    def completions(self) -> List[tuple]:
+        """Reap every ready CQE as (user_data, res) and release the slots."""
+        head = _u32.unpack_from(self._cq_ring, self._cq_head_off)[0]
+        tail = _u32.unpack_from(self._cq_ring, self._cq_tail_off)[0]
+        reaped = []
+        while head != tail:
+            user_data, res, _ = _cqe.unpack_from(
+                self._cq_ring, self._cqes_off + (head & self._cq_mask) * _cqe.size
+            )
+            reaped.append((user_data, res))
+            head = (head + 1) & 0xFFFFFFFF
+        _u32.pack_into(self._cq_ring, self._cq_head_off, head)
+        return reaped
+
+    def close(self):
+        for region in (self._sqes, self._cq_ring, self._sq_ring):
+            region.close()
+        os.close(self.fd)
+
 class NetworkPoetryGenerator:
     def __init__(
         self,
@@ -52,28 +414,54 @@ class NetworkPoetryGenerator:
     ):
         """
         Initialize the network poetry generator with:
-          - A pyshark LiveCapture instance for packet sniffing.
-          - An OpenAI client configured with the provided API key.
+          - A raw AF_PACKET socket for packet sniffing (pyshark LiveCapture as a fallback).
+          - An async OpenAI client configured with the provided API key.
           - Internal buffers and structures for storing packets and generated poems.
 
         :param interface: Name of the network interface to sniff (e.g., 'eth0').
         :param openai_api_key: OpenAI API key, obtained from environment variables (not hardcoded).
         :param buffer_size: How many packets to accumulate before generating a poem.
-        :param rate_limit_seconds: A basic rate limit (in seconds) between calls to the OpenAI API.
+        :param rate_limit_seconds: A basic rate limit (in seconds) between poems, cached or
+            freshly generated, and so also between calls to the OpenAI API.
         """
         self.interface = interface
         self.buffer_size = buffer_size
         self.rate_limit_seconds = rate_limit_seconds
 
+        # The pyshark LiveCapture is only created if raw capture is unavailable.
         # Example: In high-traffic environments, you might use capture filters:
-        #  self.capture = pyshark.LiveCapture(interface=interface, bpf_filter="tcp port 80")
-        self.capture = pyshark.LiveCapture(interface=interface)
+        #  pyshark.LiveCapture(interface=interface, bpf_filter="tcp port 80")
+        self.capture = None
+
+        self.openai_client = openai.AsyncOpenAI(api_key=openai_api_key)
+        self._buf = np.zeros(buffer_size, dtype=_PKT_DTYPE)  # Exactly one batch
+        self._n = 0
+        self.dropped_packets = 0  # Only written by the capture thread
+        # Rows handed over by the capture thread. Bounded so that, when poems
+        # fall behind, the oldest rows are discarded and batches stay fresh.
+        self._backlog: deque = deque(maxlen=buffer_size * MAX_CONCURRENT_POEMS)
+        self._packets_ready: Optional[asyncio.Event] = None  # Created inside the running loop
+        self._wake_pending = False  # A _wake is already scheduled on the loop
+        self._stop_capture = threading.Event()
+        self.poetry_archive: Dict[int, PoetryArchiveEntry] = {}
+        self._archive_seq = 0  # Archive keys; timestamps collide when poems land together
+        self._archive_fp = None  # JSONL log, open while process_packets runs
+
+        # LRU of (expires_at, poem) keyed by poem_cache_key(), so repeated
+        # batches skip OpenAI until the entry expires. While a poem is being
+        # generated its key maps to a Future instead, which identical batches
+        # in the same round await rather than making calls of their own.
+        self._cache: OrderedDict[bytes, object] = OrderedDict()
 
-        self.openai_client = openai.Client(api_key=openai_api_key)
-        self.packet_buffer: List[PacketData] = []
-        self.poetry_archive: Dict[str, PoetryArchiveEntry] = defaultdict()
+        # Per-style MinHash LSH indexes over flow sets, and the poems they point
+        # to as (style, poem, expires_at, reuses) in insertion order, which is
+        # also expiry order, for FIFO eviction. Skipped without datasketch.
+        self._lsh: Dict[PoetryStyle, "MinHashLSH"] = {}
+        self._lsh_poems: OrderedDict[bytes, tuple] = OrderedDict()
+        # Empty MinHash copied per batch, so the permutations are generated only once
+        self._minhash_template = MinHash(num_perm=LSH_NUM_PERM) if MinHash is not None else None
 
-        # For basic rate-limiting
+        # For basic rate-limiting: when the most recently scheduled poem is due
         self.last_api_call_time = 0.0
 
     def anonymize_ip(self, ip_address: str) -> str:
@@ -89,191 +477,741 @@ class NetworkPoetryGenerator:
             return f"{parts[0]}.{parts[1]}.x.x"
         return ip_address  # For non-IPv4 or corner cases, no change
 
-    def extract_packet_data(self, packet) -> Optional[PacketData]:
+    @staticmethod
+    def pack_ip(ip_address: str) -> int:
+        """
+        Pack a dotted-quad IPv4 string into the anonymized uint32 form used by
+        the packet buffer. "Unknown" (or anything unparsable) becomes UNKNOWN_IP.
+        """
+        try:
+            return int.from_bytes(socket.inet_aton(ip_address), 'big') & IP_ANONYMIZE_MASK
+        except OSError:
+            return UNKNOWN_IP
+
+    def render_ip(self, address: int) -> str:
+        """
+        Turn a uint32 address from the packet buffer back into anonymized text.
+        Only called when a batch is flushed, never per captured packet.
+        """
+        if address == UNKNOWN_IP:
+            return "Unknown"
+        return self.anonymize_ip(socket.inet_ntoa(address.to_bytes(4, 'big')))
+
+    def parse_frame(self, frame: memoryview, length: int) -> Optional[tuple]:
+        """
+        Parse an Ethernet frame read from a raw socket into a packet buffer row
+        (see _PKT_DTYPE). VLAN tags are skipped. IPv4 frames keep their masked
+        addresses. IPv6 frames keep their transport ports when TCP or UDP
+        directly follows the fixed header, with "Unknown" addresses as pyshark's
+        packet.ip gave them. Anything else (ARP, ...) becomes an "Unknown" row.
+
+        :param frame: The captured bytes (possibly truncated to FRAME_BUFFER_SIZE).
+        :param length: The original on-the-wire length of the frame.
+        """
+        if len(frame) < ETH_HLEN:
+            return None
+        _, ethertype = _eth_hdr.unpack_from(frame)
+        network_offset = ETH_HLEN
+        if ethertype in _VLAN_ETHERTYPES and len(frame) >= ETH_HLEN + _vlan_tag.size:
+            _, ethertype = _vlan_tag.unpack_from(frame, ETH_HLEN)
+            network_offset += VLAN_HLEN
+
+        src_ip = UNKNOWN_IP
+        dst_ip = UNKNOWN_IP
+        proto = 0
+        transport_offset = None
+
+        if ethertype == ETH_P_IP and len(frame) >= network_offset + _ip_hdr.size:
+            ver_ihl, _, _, _, _, _, proto, _, src, dst = _ip_hdr.unpack_from(frame, network_offset)
+            src_ip = int.from_bytes(src, 'big') & IP_ANONYMIZE_MASK
+            dst_ip = int.from_bytes(dst, 'big') & IP_ANONYMIZE_MASK
+            transport_offset = network_offset + (ver_ihl & 0x0F) * 4
+        elif ethertype == ETH_P_IPV6 and len(frame) >= network_offset + IPV6_HLEN:
+            proto = frame[network_offset + 6]  # Next header; extension headers are not followed
+            transport_offset = network_offset + IPV6_HLEN
+
+        port_src = 0
+        port_dst = 0
+        flags = 0
+
+        if proto == 6 and len(frame) >= transport_offset + _tcp_hdr.size:
+            port_src, port_dst, _, _, _, flags, _, _, _ = _tcp_hdr.unpack_from(
+                frame, transport_offset
+            )
+        elif proto == 17 and len(frame) >= transport_offset + _udp_ports.size:
+            port_src, port_dst = _udp_ports.unpack_from(frame, transport_offset)
+
+        return (
+            src_ip,
+            dst_ip,
+            proto,
+            length,
+            port_src,
+            port_dst,
+            flags
+        )
+
+    def _open_raw_socket(self) -> socket.socket:
+        """
+        Open a Linux AF_PACKET socket bound to the configured interface.
+        Raises OSError (e.g. PermissionError without CAP_NET_RAW) if unavailable.
+        """
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        try:
+            sock.bind((self.interface, 0))
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    @staticmethod
+    def _is_loopback(sock: socket.socket) -> bool:
+        """Whether the raw socket is bound to a loopback interface (sll_hatype)."""
+        return sock.getsockname()[3] == ARPHRD_LOOPBACK
+
+    def _raw_capture(self, sock: socket.socket) -> Iterator[List[tuple]]:
+        """
+        Read frames from a raw socket into a single reusable buffer and parse
+        the headers in place. MSG_TRUNC makes recvfrom_into report the full
+        frame length even when the frame is larger than the buffer, and the
+        address it returns gives the packet type for the loopback check.
+        Blocks for the first frame, then drains whatever else is already
+        waiting (up to RECV_BATCH_SIZE) without blocking, and yields the lot.
+        """
+        buffer = bytearray(FRAME_BUFFER_SIZE)
+        view = memoryview(buffer)
+        loopback = self._is_loopback(sock)
+        try:
+            while True:
+                rows = []
+                flags = socket.MSG_TRUNC
+                while len(rows) < RECV_BATCH_SIZE:
+                    try:
+                        length, address = sock.recvfrom_into(buffer, 0, flags)
+                    except BlockingIOError:
+                        break
+                    flags = socket.MSG_TRUNC | socket.MSG_DONTWAIT
+                    if loopback and address[2] == socket.PACKET_OUTGOING:
+                        continue
+                    row = self.parse_frame(view[:min(length, FRAME_BUFFER_SIZE)], length)
+                    if row:
+                        rows.append(row)
+                yield rows
+        finally:
+            sock.close()
+
+    def _map_rx_ring(self, sock: socket.socket) -> mmap.mmap:
+        """
+        Switch the socket to TPACKET_V3 and map its PACKET_RX_RING.
+        Raises OSError if the kernel refuses; the socket is then left usable
+        for ordinary reads.
+        """
+        sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+        sock.setsockopt(SOL_PACKET, PACKET_RX_RING, _tpacket_req3.pack(
+            RING_BLOCK_SIZE,
+            RING_BLOCK_COUNT,
+            RING_FRAME_SIZE,
+            RING_BLOCK_SIZE * RING_BLOCK_COUNT // RING_FRAME_SIZE,
+            RING_BLOCK_TIMEOUT_MS,
+            0,
+            0
+        ))
+        try:
+            return mmap.mmap(sock.fileno(), RING_BLOCK_SIZE * RING_BLOCK_COUNT)
+        except OSError:
+            # Tear the ring down again, otherwise frames never reach recv()
+            sock.setsockopt(SOL_PACKET, PACKET_RX_RING, _tpacket_req3.pack(0, 0, 0, 0, 0, 0, 0))
+            raise
+
+    def _ring_capture(self, sock: socket.socket, ring: mmap.mmap) -> Iterator[List[tuple]]:
+        """
+        Walk the TPACKET_V3 ring block by block. Once the kernel marks a block
+        TP_STATUS_USER, every frame in it is parsed in place, the block is
+        handed back by resetting its status, and its rows are yielded together.
+        poll() is only needed when we have caught up with the kernel, and it
+        wakes periodically to notice shutdown.
+        """
+        poller = select.poll()
+        poller.register(sock, select.POLLIN | select.POLLERR)
+        view = memoryview(ring)
+        loopback = self._is_loopback(sock)
+        block = 0
+        try:
+            while not self._stop_capture.is_set():
+                block_start = block * RING_BLOCK_SIZE
+                status, num_pkts, offset = _block_hdr.unpack_from(ring, block_start + _BLOCK_HDR_OFFSET)
+                if not status & TP_STATUS_USER:
+                    poller.poll(RING_IDLE_POLL_MS)
+                    continue
+
+                rows = []
+                frame_start = block_start + offset
+                for _ in range(num_pkts):
+                    next_offset, _, _, snaplen, length, _, mac = _tpacket3_hdr.unpack_from(
+                        ring, frame_start
+                    )
+                    pkttype = ring[frame_start + _TPACKET3_PKTTYPE_OFFSET]
+                    if not (loopback and pkttype == socket.PACKET_OUTGOING):
+                        start = frame_start + mac
+                        row = self.parse_frame(view[start:start + snaplen], length)
+                        if row:
+                            rows.append(row)
+                    frame_start += next_offset
+
+                _u32.pack_into(ring, block_start + _BLOCK_HDR_OFFSET, TP_STATUS_KERNEL)
+                block = (block + 1) % RING_BLOCK_COUNT
+                yield rows
+        finally:
+            view.release()
+            ring.close()
+            sock.close()
+
+    def _uring_capture(self, sock: socket.socket, ring: IoUring) -> Iterator[List[tuple]]:
+        """
+        Keep URING_QUEUE_DEPTH recvs in flight on the raw socket, each into its
+        own slice of one preallocated arena, and reap completions in batches.
+        One io_uring_enter both resubmits the drained buffers and waits for more,
+        so the syscall cost is shared by every packet in the batch, and the
+        batch's rows are yielded together.
+        """
+        arena = bytearray(URING_QUEUE_DEPTH * FRAME_BUFFER_SIZE)
+        base = ctypes.addressof((ctypes.c_char * len(arena)).from_buffer(arena))
+        view = memoryview(arena)
+        fd = sock.fileno()
+        try:
+            for slot in range(URING_QUEUE_DEPTH):
+                ring.queue_recv(fd, base + slot * FRAME_BUFFER_SIZE, FRAME_BUFFER_SIZE,
+                                socket.MSG_TRUNC, slot)
+            while True:
+                ring.submit_and_wait()
+                rows = []
+                for slot, length in ring.completions():
+                    if length < 0:
+                        raise OSError(-length, os.strerror(-length))
+                    start = slot * FRAME_BUFFER_SIZE
+                    row = self.parse_frame(view[start:start + min(length, FRAME_BUFFER_SIZE)], length)
+                    ring.queue_recv(fd, base + start, FRAME_BUFFER_SIZE, socket.MSG_TRUNC, slot)
+                    if row:
+                        rows.append(row)
+                yield rows
+        finally:
+            ring.close()
+            sock.close()
+
+    def _pyshark_capture(self) -> Iterator[List[tuple]]:
+        """
+        Fallback capture through pyshark/tshark for platforms without AF_PACKET.
+        Runs on the capture thread, so pyshark gets an event loop of its own:
+        it drives tshark with run_until_complete, which would fail on the
+        application's already-running loop.
+        """
+        if pyshark is None:
+            raise RuntimeError("Raw capture is unavailable and pyshark is not installed.")
+        eventloop = asyncio.new_event_loop()
+        try:
+            self.capture = pyshark.LiveCapture(interface=self.interface, eventloop=eventloop)
+            for packet in self.capture.sniff_continuously():
+                row = self.extract_packet_data(packet)
+                if row:
+                    yield [row]
+        finally:
+            if self.capture is not None:
+                self.capture.close()
+            eventloop.close()
+
+    def _raw_socket_capture(self, sock: socket.socket) -> Iterator[List[tuple]]:
+        """
+        Pick the fastest way to read the raw socket this kernel allows:
+        the TPACKET_V3 mmap ring, then io_uring, then plain recvfrom_into.
+        io_uring is skipped on loopback: its recvs carry no sll_pkttype, so
+        the outgoing copy of each packet could not be told apart.
+        """
+        try:
+            ring = self._map_rx_ring(sock)
+        except OSError as e:
+            logger.info(f"PACKET_MMAP ring unavailable ({e}), trying io_uring.")
+        else:
+            return self._ring_capture(sock, ring)
+
+        if self._is_loopback(sock):
+            logger.info("Capturing on loopback, using recv on the raw socket.")
+            return self._raw_capture(sock)
+        try:
+            uring = IoUring(URING_QUEUE_DEPTH * 2)
+        except OSError as e:
+            logger.info(f"io_uring unavailable ({e}), using recv on the raw socket.")
+            return self._raw_capture(sock)
+        return self._uring_capture(sock, uring)
+
+    def packet_stream(self) -> Iterator[List[tuple]]:
         """
-        Extract relevant details from a pyshark packet object.
+        Yield lists of packet buffer rows, one per ring block or read batch,
+        from the fastest capture backend available: a raw AF_PACKET socket on
+        Linux (see _raw_socket_capture), pyshark everywhere else.
+        """
+        if hasattr(socket, "AF_PACKET"):
+            try:
+                sock = self._open_raw_socket()
+            except OSError as e:
+                logger.warning(f"Raw capture unavailable ({e}), falling back to pyshark.")
+            else:
+                yield from self._raw_socket_capture(sock)
+                return
+        yield from self._pyshark_capture()
+
+    def extract_packet_data(self, packet) -> Optional[tuple]:
+        """
+        Extract relevant details from a pyshark packet object into a packet
+        buffer row (see _PKT_DTYPE).
         Return None if extraction fails (to gracefully handle anomalies).
         """
         try:
-            # Safely get IP and transport details if they exist
-            src_ip = getattr(packet.ip, 'src', "Unknown") if hasattr(packet, 'ip') else "Unknown"
-            dest_ip = getattr(packet.ip, 'dst', "Unknown") if hasattr(packet, 'ip') else "Unknown"
-            protocol = getattr(packet, 'transport_layer', "Unknown")
+            # Each layer lookup makes pyshark dissect, so bind the layers once
+            ip = getattr(packet, 'ip', None)
+            src_ip = ip.src if ip is not None else "Unknown"
+            dest_ip = ip.dst if ip is not None else "Unknown"
+            protocol = packet.transport_layer or "Unknown"
             length = int(packet.length)
-            timestamp = time.time()
 
-            port_src = None
-            port_dst = None
-            flags = None
+            port_src = 0
+            port_dst = 0
+            flags = 0
 
-            if protocol != "Unknown":
+            if protocol in _PROTOCOL_NUMBERS:
                 # Example: tcp or udp
-                transport_info = getattr(packet, protocol.lower(), None)
-                if transport_info:
-                    port_src = int(getattr(transport_info, 'srcport', 0))
-                    port_dst = int(getattr(transport_info, 'dstport', 0))
-                    flags = getattr(transport_info, 'flags', None)
-
-            return PacketData(
-                src_ip=self.anonymize_ip(src_ip),
-                dest_ip=self.anonymize_ip(dest_ip),
-                protocol=protocol,
-                length=length,
-                timestamp=timestamp,
-                port_src=port_src,
-                port_dst=port_dst,
-                flags=flags
+                transport = packet[protocol]
+                port_src = int(transport.srcport)
+                port_dst = int(transport.dstport)
+                flags = int(getattr(transport, 'flags', "0"), 16) & 0xFF
+
+            return (
+                self.pack_ip(src_ip),
+                self.pack_ip(dest_ip),
+                _PROTOCOL_NUMBERS.get(protocol, 0),
+                length,
+                port_src,
+                port_dst,
+                flags
             )
         except Exception as e:
             logger.error(f"Error extracting packet data: {e}")
             return None
 
-    def craft_prompt(self, packets: List[PacketData], style: PoetryStyle) -> str:
+    def buffer_packet(self, row: tuple):
         """
-        Build the text prompt sent to OpenAI. 
-        Each packet is described, and the style context (Pessoa, Whitman, or Dickinson) is included.
-        You can refine this prompt to get more consistent or more creative results.
+        Append one row to the packet buffer: a single index write into the
+        preallocated array. _take_rows() never fills it past buffer_size.
         """
-        base_context = {
-            PoetryStyle.PESSOA: """
-                Channel the introspective, philosophical voice of Fernando Pessoa's heteronyms.
-                Contemplate each packet as a fleeting moment of consciousness traversing the ether.
-                Reflect on the metaphysical nature of data moving through intangible spaces.
-            """,
-            PoetryStyle.WHITMAN: """
-                Embrace Walt Whitman's grand, expansive style.
-                Treat each packet as part of a cosmic tapestry of modern life.
-                Weave the digital flow into humanity's universal song.
-            """,
-            PoetryStyle.DICKINSON: """
-                Employ Emily Dickinson's delicate yet potent verse.
-                Observe the micro-moments of transmission with a keen, almost reverent eye.
-                Harness unusual punctuation and subtle metaphor to illuminate digital rhythms.
-            """
-        }
-
-        # Turn each packet into a short descriptive line
-        packet_descriptions = []
-        for packet in packets:
-            description = (
-                f"Data from {packet.src_ip}:{packet.port_src} "
-                f"to {packet.dest_ip}:{packet.port_dst}, "
-                f"{packet.length} bytes via {packet.protocol}."
-            )
-            packet_descriptions.append(description)
+        self._buf[self._n] = row
+        self._n += 1
+
+    def _wake(self):
+        """
+        Runs on the event loop (via call_soon_threadsafe) once per handoff,
+        however many batches the capture thread appended in the meantime.
+        """
+        self._wake_pending = False
+        self._packets_ready.set()
+
+    def _capture_thread(self, loop: asyncio.AbstractEventLoop, done: Future):
+        """
+        Producer: run the blocking capture loop on its own thread and append
+        each batch of rows to the backlog, so capture never stalls poem
+        generation. The loop is woken at most once per pending handoff rather
+        than once per packet. When the backlog is full its oldest rows are
+        dropped here, on this thread, and counted in dropped_packets.
+        Once _stop_capture is set, the next batch ends the loop, which closes
+        the capture backend (socket, ring, or tshark) on this thread.
+        """
+        backlog = self._backlog
+        try:
+            stream = self.packet_stream()
+            try:
+                for rows in stream:
+                    if self._stop_capture.is_set():
+                        break
+                    if not rows:
+                        continue
+                    overflow = len(backlog) + len(rows) - backlog.maxlen
+                    if overflow > 0:
+                        self.dropped_packets += overflow
+                    backlog.extend(rows)
+                    if not self._wake_pending:
+                        self._wake_pending = True
+                        loop.call_soon_threadsafe(self._wake)
+            finally:
+                stream.close()
+        except Exception as e:
+            if not done.cancelled():
+                done.set_exception(e)
+        else:
+            if not done.cancelled():
+                done.set_result(None)
 
-        return f"""
-        {base_context[style]}
+    def _take_rows(self):
+        """Move rows from the backlog into the packet buffer, up to buffer_size."""
+        backlog = self._backlog
+        while self._n < self.buffer_size and backlog:
+            self.buffer_packet(backlog.popleft())
 
-        Consider the following network movements:
-        {chr(10).join(packet_descriptions)}
+    async def next_batch(self) -> List[PacketData]:
+        """
+        Consumer: wait for the first packet, then collect up to buffer_size
+        packets. A short batch is flushed PARTIAL_FLUSH_SECONDS after its first
+        packet, so quiet links still produce poems.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None
 
-        Transform these digital flows into a poem in the style of {style.value}.
-        Contemplate the symbolic meaning of ephemeral packets dancing between nodes, 
-        the resonance of intangible data in our digital consciousness, 
-        and any deeper metaphors you see fit.
+        while True:
+            self._take_rows()
+            if self._n >= self.buffer_size:
+                break
+            if self._n and deadline is None:
+                deadline = loop.time() + PARTIAL_FLUSH_SECONDS
+            # Clear before re-checking, so a wake landing in between is kept
+            self._packets_ready.clear()
+            if self._backlog:
+                continue
+            if deadline is None:
+                await self._packets_ready.wait()
+                continue
+            try:
+                await asyncio.wait_for(self._packets_ready.wait(), deadline - loop.time())
+            except asyncio.TimeoutError:
+                break
+
+        return self.drain_buffer()
+
+    def ready_batch(self) -> Optional[List[PacketData]]:
+        """
+        Take a full batch straight off the backlog if one is already waiting,
+        without awaiting; otherwise return None.
         """
+        if len(self._backlog) < self.buffer_size:
+            return None
+        self._take_rows()
+        return self.drain_buffer()
 
-    async def generate_poetry(self, prompt: str) -> str:
+    def drain_buffer(self) -> List[PacketData]:
         """
-        Send the prompt to OpenAI and retrieve the text generated.
-        Includes a simple rate-limiting approach based on time.
+        Materialize the buffered rows as PacketData (IPs still packed) and reset the buffer.
+        This is the only place captured packets become Python objects.
         """
-        # Simple time-based rate limiting:
-        elapsed = time.time() - self.last_api_call_time
-        if elapsed < self.rate_limit_seconds:
-            await asyncio.sleep(self.rate_limit_seconds - elapsed)
+        rows = self._buf[:self._n].tolist()
+        self._n = 0
 
+        packets = []
+        for src_ip, dst_ip, proto, length, sport, dport, flags in rows:
+            has_ports = proto in _IP_PROTOCOLS
+            packets.append(PacketData(
+                src_ip=src_ip,
+                dest_ip=dst_ip,
+                protocol=_IP_PROTOCOLS.get(proto, "Unknown"),
+                length=length,
+                port_src=sport if has_ports else None,
+                port_dst=dport if has_ports else None,
+                flags=f"0x{flags:04x}" if proto == 6 else None  # pyshark's tcp.flags format
+            ))
+        return packets
+
+    def packet_record(self, packet: PacketData) -> dict:
+        """
+        PacketData as a plain dict for the archive, with the packed IPs
+        rendered back to anonymized dotted quads.
+        """
+        record = dict(zip(_PACKET_FIELDS, _packet_values(packet)))
+        record['src_ip'] = self.render_ip(packet.src_ip)
+        record['dest_ip'] = self.render_ip(packet.dest_ip)
+        return record
+
+    def craft_prompt(self, packets: List[PacketData], style: PoetryStyle) -> List[dict]:
+        """
+        Build the chat messages sent to OpenAI: the fixed system message for the
+        style (Pessoa, Whitman, or Dickinson), then a user message describing
+        only this batch's packets and asking for the poem.
+        You can refine the style instructions in _STYLE_CONTEXT
+        to get more consistent or more creative results.
+        """
+        packet_block = _PACKET_BLOCK_HEADER + "\n".join(
+            # Non-TCP/UDP packets have no ports; the brief says these show as 0
+            f"Data from {self.render_ip(p.src_ip)}:{p.port_src or 0} "
+            f"to {self.render_ip(p.dest_ip)}:{p.port_dst or 0}, "
+            f"{p.length} bytes via {p.protocol}."
+            for p in packets
+        ) + _STYLE_REQUESTS[style]
+        return [
+            {"role": "system", "content": _STYLE_SYSTEM_MESSAGES[style]},
+            {"role": "user", "content": packet_block}
+        ]
+
+    async def generate_poetry(self, messages: List[dict]) -> str:
+        """
+        Send the chat messages to OpenAI and retrieve the text generated.
+        Rate limiting is applied per poem by compose_poetry(), not here.
+        """
         try:
-            response = await asyncio.to_thread(
-                lambda: self.openai_client.completions.create(
-                    model="gpt-4",
-                    prompt=prompt,
-                    max_tokens=200,
-                    temperature=0.9
-                )
+            # Native async client: the HTTP wait suspends this coroutine instead
+            # of tying up a worker thread. gpt-4 is a chat model, so use chat completions.
+            response = await self.openai_client.chat.completions.create(
+                model="gpt-4",
+                messages=messages,
+                max_tokens=POEM_MAX_TOKENS,
+                temperature=0.9
             )
-            self.last_api_call_time = time.time()
-            return response.choices[0].text.strip()
+            usage = response.usage
+            if usage is not None and usage.prompt_tokens_details is not None:
+                logger.debug(
+                    f"Prompt tokens: {usage.prompt_tokens}, "
+                    f"served from cache: {usage.prompt_tokens_details.cached_tokens}"
+                )
+            return response.choices[0].message.content.strip()
         except Exception as e:
             logger.error(f"Error generating poetry: {e}")
             # Optionally handle 429 rate-limit errors specifically:
             # if "rate limit" in str(e).lower():
             #     await asyncio.sleep(5)  # backoff
-            #     return await self.generate_poetry(prompt)
-            return "Error generating poetic response"
+            #     return await self.generate_poetry(messages)
+            return POETRY_ERROR_MESSAGE
+
+    def poem_cache_key(self, packets: List[PacketData], style: PoetryStyle) -> bytes:
+        """
+        Signature of a batch for the poem cache: a digest of the style plus the
+        sorted multiset of flows, so packet order and source ports don't matter.
+        """
+        flows = sorted(
+            f"{p.src_ip}>{p.dest_ip}:{p.port_dst}/{p.protocol}".encode() for p in packets
+        )
+        return hashlib.blake2b(
+            b"|".join([style.value.encode(), *flows]), digest_size=16
+        ).digest()
+
+    def flow_minhash(self, packets: List[PacketData]) -> Optional["MinHash"]:
+        """
+        MinHash of the batch's (src, dst, protocol) flows. Ports are left out
+        because ephemeral source ports change on every connection while the
+        flows themselves repeat. Returns None when datasketch is unavailable.
+        """
+        if MinHash is None:
+            return None
+        signature = self._minhash_template.copy()
+        signature.update_batch(
+            [f"{p.src_ip}>{p.dest_ip}/{p.protocol}".encode() for p in packets]
+        )
+        return signature
+
+    def _remember_similar(self, key: bytes, signature: "MinHash", style: PoetryStyle, poetry: str):
+        """Index a freshly generated poem for near-match lookups, evicting the oldest."""
+        if key in self._lsh_poems:
+            return
+        if style not in self._lsh:
+            self._lsh[style] = MinHashLSH(threshold=LSH_THRESHOLD, num_perm=LSH_NUM_PERM)
+        self._lsh[style].insert(key, signature)
+        self._lsh_poems[key] = (style, poetry, time.monotonic() + LSH_TTL_SECONDS, 0)
+
+        if len(self._lsh_poems) > LSH_CACHE_SIZE:
+            self._forget_similar(next(iter(self._lsh_poems)))
+
+    def _forget_similar(self, key: bytes):
+        """Drop a poem from the near-match index."""
+        style = self._lsh_poems.pop(key)[0]
+        self._lsh[style].remove(key)
+
+    def _reuse_similar(self, signature: "MinHash", style: PoetryStyle) -> Optional[str]:
+        """
+        Return an indexed poem for a batch similar to this one, if any.
+        Expired entries are dropped first, and an entry is dropped once it has
+        been reused LSH_MAX_REUSES times, so a steady trickle of look-alike
+        batches still earns fresh poems.
+        """
+        now = time.monotonic()
+        while self._lsh_poems:
+            oldest = next(iter(self._lsh_poems))
+            if self._lsh_poems[oldest][2] > now:
+                break
+            self._forget_similar(oldest)
+
+        if style not in self._lsh:
+            return None
+        for similar in self._lsh[style].query(signature):
+            _, poetry, expires_at, reuses = self._lsh_poems[similar]
+            if reuses + 1 >= LSH_MAX_REUSES:
+                self._forget_similar(similar)
+            else:
+                self._lsh_poems[similar] = (style, poetry, expires_at, reuses + 1)
+            return poetry
+        return None
+
+    async def wait_for_rate_limit(self):
+        """
+        Simple time-based rate limiting, applied to every poem whether it is
+        cached or generated, so a busy link cannot flood the log and archive
+        with repeats. The slot is reserved before awaiting, so concurrent
+        batches are spaced out rather than all going at once.
+        """
+        now = time.time()
+        start = max(now, self.last_api_call_time + self.rate_limit_seconds)
+        self.last_api_call_time = start
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def compose_poetry(self, packets: List[PacketData], style: PoetryStyle) -> str:
+        """
+        Return a poem for the batch, serving it from the LRU cache when an
+        identical set of flows has been seen within POEM_CACHE_TTL_SECONDS, or
+        from the LSH index when a similar one has (see _reuse_similar).
+        Identical batches generated concurrently share a single call. Only
+        misses reach OpenAI, and failed generations are never cached.
+        """
+        await self.wait_for_rate_limit()
+
+        key = self.poem_cache_key(packets, style)
+        cached = self._cache.get(key)
+        if isinstance(cached, asyncio.Future):
+            logger.debug("Identical batch already in flight, sharing its poem.")
+            # Shielded, so cancelling this waiter leaves the shared call running
+            return await asyncio.shield(cached)
+        if cached is not None:
+            expires_at, poetry = cached
+            if time.monotonic() < expires_at:
+                self._cache.move_to_end(key)
+                logger.debug("Poem cache hit, skipping OpenAI call.")
+                return poetry
+            del self._cache[key]
+
+        signature = self.flow_minhash(packets)
+        if signature is not None:
+            poetry = self._reuse_similar(signature, style)
+            if poetry is not None:
+                logger.debug("Poem cache near hit, skipping OpenAI call.")
+                return poetry
+
+        in_flight = asyncio.get_running_loop().create_future()
+        self._cache[key] = in_flight
+        poetry = POETRY_ERROR_MESSAGE
+        try:
+            poetry = await self.generate_poetry(self.craft_prompt(packets, style))
+        finally:
+            in_flight.set_result(poetry)
+            if self._cache.get(key) is in_flight:
+                del self._cache[key]
+
+        if poetry != POETRY_ERROR_MESSAGE:
+            self._cache[key] = (time.monotonic() + POEM_CACHE_TTL_SECONDS, poetry)
+            if len(self._cache) > POEM_CACHE_SIZE:
+                self._cache.popitem(last=False)
+            if signature is not None:
+                self._remember_similar(key, signature, style, poetry)
+        return poetry
 
     async def process_packets(self, style: PoetryStyle = PoetryStyle.PESSOA):
         """
-        Start sniffing packets in real-time, accumulate them in a buffer,
-        and periodically transform them into poems once buffer_size is reached.
+        Start sniffing packets in real-time on a capture thread, hand them to
+        the event loop in batches, and transform each batch of buffer_size packets into a poem.
         """
 
         async def buffer_processor():
+            reported_drops = 0
             while True:
-                # When we've got a chunk of packets, build a poem
-                if len(self.packet_buffer) >= self.buffer_size:
-                    prompt = self.craft_prompt(self.packet_buffer, style)
-                    poetry = await self.generate_poetry(prompt)
+                # Wakes as soon as a chunk of packets is ready, no polling
+                batches = [await self.next_batch()]
+
+                # On a busy link more batches are already queued: request their
+                # poems together so the OpenAI round-trips overlap
+                while len(batches) < MAX_CONCURRENT_POEMS:
+                    packets = self.ready_batch()
+                    if packets is None:
+                        break
+                    batches.append(packets)
+
+                poems = await asyncio.gather(
+                    *(self.compose_poetry(packets, style) for packets in batches)
+                )
 
+                for packets, poetry in zip(batches, poems):
                     archive_entry = PoetryArchiveEntry(
                         poetry=poetry,
-                        packets=[vars(p) for p in self.packet_buffer],
+                        packets=[self.packet_record(p) for p in packets],
                         style=style.value
                     )
 
-                    # Use the timestamp as a dict key
-                    self.poetry_archive[archive_entry.generated_at] = archive_entry
-
-                    # Clear the current buffer
-                    self.packet_buffer.clear()
+                    self.archive(archive_entry)
 
                     logger.info(
                         f"\n--- New Poetry Generated at {archive_entry.generated_at} ---\n{poetry}\n"
                     )
 
-                    # Optionally, you could integrate a real-time web display or GUI update here.
-                    # For example, if you had a queue or websocket, you'd send the poem out.
+                # One flush per round, so the log is current even if the process dies
+                self._archive_fp.flush()
+
+                dropped = self.dropped_packets
+                if dropped > reported_drops:
+                    logger.warning(
+                        f"Dropped {dropped - reported_drops} stale packets while poems were "
+                        f"being written ({dropped} in total)."
+                    )
+                    reported_drops = dropped
+
+                # Optionally, you could integrate a real-time web display or GUI update here.
+                # For example, if you had a queue or websocket, you'd send the poem out.
 
-                await asyncio.sleep(1)  # Sleep briefly to avoid hammering
+        self._backlog.clear()
+        self._packets_ready = asyncio.Event()
+        self._wake_pending = False
+        self._archive_fp = open(ARCHIVE_LOG_PATH, 'ab', buffering=ARCHIVE_LOG_BUFFERING)
 
-        # Spin up the asynchronous task that inspects the buffer
+        # Spin up the asynchronous task that consumes the backlog
         buffer_processor_task = asyncio.create_task(buffer_processor())
 
-        # Main packet-capturing loop
+        # Packet capture blocks, so it runs on a daemon thread feeding the backlog
+        capture_done = Future()
+        self._stop_capture.clear()
+        threading.Thread(
+            target=self._capture_thread,
+            args=(asyncio.get_running_loop(), capture_done),
+            name="packet-capture",
+            daemon=True
+        ).start()
+
         try:
-            for packet in self.capture.sniff_continuously():
-                packet_data = self.extract_packet_data(packet)
-                if packet_data:
-                    self.packet_buffer.append(packet_data)
-                await asyncio.sleep(0.01)  # Slight tweak for more responsive loops
+            await asyncio.wrap_future(capture_done)
         except KeyboardInterrupt:
             logger.info("Stopping packet capture...")
-            buffer_processor_task.cancel()
         finally:
+            self._stop_capture.set()
+            buffer_processor_task.cancel()
+            self._archive_fp.close()
+            self._archive_fp = None
             # Save any final results to disk before exiting
             self.save_archive()
 
+    def archive(self, entry: PoetryArchiveEntry):
+        """
+        Append the entry to the JSONL log (a single buffered write; the log is
+        flushed once per round of poems) and keep it in the bounded in-memory
+        archive, evicting the oldest.
+        """
+        if self._archive_fp is not None:
+            self._archive_fp.write(orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE))
+
+        self.poetry_archive[self._archive_seq] = entry
+        self._archive_seq += 1
+        while len(self.poetry_archive) > ARCHIVE_MEMORY_LIMIT:
+            del self.poetry_archive[next(iter(self.poetry_archive))]
+
     def save_archive(self):
         """
-        Store the entire poetry archive to a JSON file for future perusal.
+        Store the in-memory poetry archive (the most recent ARCHIVE_MEMORY_LIMIT
+        poems; the JSONL log has them all) to a JSON file for future perusal.
         Anonymized IP addresses and other sensitive details are retained 
         (or not) according to the approach in extract_packet_data().
         """
         try:
-            # Convert dataclass objects to simple dictionaries
-            archive_dict = {
-                timestamp: {
-                    'poetry': entry.poetry,
-                    'packets': entry.packets,
-                    'style': entry.style,
-                    'generated_at': entry.generated_at
-                }
-                for timestamp, entry in self.poetry_archive.items()
-            }
-
-            with open('network_poetry_archive.json', 'w') as f:
-                json.dump(archive_dict, f, indent=2)
+            # orjson serializes the PoetryArchiveEntry dataclasses directly
+            with open('network_poetry_archive.json', 'wb') as f:
+                f.write(orjson.dumps(
+                    self.poetry_archive, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+                ))
 
             logger.info("Poetry archive saved successfully.")
         except Exception as e:
@@ -295,4 +1233,9 @@ async def main():
     await generator.process_packets()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        import uvloop  # Faster libuv-based event loop, used when installed
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())